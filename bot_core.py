@@ -0,0 +1,714 @@
+# ========================================================================================
+# === 1. IMPORTS & SETUP =================================================================
+# ========================================================================================
+import os
+import re
+import logging
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+import redis.asyncio as aioredis
+import yt_dlp
+from cachetools import TTLCache
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Bot
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
+from telegram.constants import ParseMode
+from telegram.error import NetworkError
+from telegram.request import HTTPXRequest
+
+# ========================================================================================
+# === 2. LOGGING SETUP ===================================================================
+# ========================================================================================
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+# Har Bot API / HTTP request par INFO line na aaye (logging lock par bhi kam contention)
+for _noisy in ('httpx', 'httpcore', 'aiohttp.access'):
+    logging.getLogger(_noisy).setLevel(logging.WARNING)
+
+# ========================================================================================
+# === 3. CONFIGURATION ===================================================================
+# ========================================================================================
+class Config:
+    try:
+        TELEGRAM_TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
+        WEBHOOK_URL = os.environ["WEBHOOK_URL"]
+    except KeyError as e:
+        logger.critical("FATAL: Environment variable %s set nahi hai! App band ho raha hai.", e)
+        exit()
+    # Optional local telegram-bot-api server (jaise http://localhost:8081). Local mode mein video
+    # upload nahi hoti: server DOWNLOAD_BASE se file seedha padhta hai, isliye dono ka filesystem same ho.
+    TELEGRAM_LOCAL_API = os.environ.get("TELEGRAM_LOCAL_API")
+    TELEGRAM_API_BASE = (TELEGRAM_LOCAL_API or "https://api.telegram.org").rstrip("/")
+    MAX_FILE_SIZE = (2000 if TELEGRAM_LOCAL_API else 50) * 1024 * 1024
+    # Opt-in: Telegram ko format URL dena. googlevideo URLs aam taur par extract karne wale IP se bandhe
+    # hote hain (ip= param) aur Telegram ko 403 milta hai, isliye default band; woh URLs skip bhi hote hain.
+    URL_UPLOAD = os.environ.get("URL_UPLOAD", "").lower() in ("1", "true", "yes")
+    URL_UPLOAD_MAX_SIZE = 20 * 1024 * 1024  # Telegram khud URL se itni badi file tak fetch karta hai
+    # Base dir explicitly set karein (jaise disk-backed volume) agar /tmp chhota tmpfs hai
+    DOWNLOAD_BASE = os.environ.get("DOWNLOAD_BASE", tempfile.gettempdir())
+    DOWNLOAD_PREFIX = 'ytbot_'
+    # Naam mein PID hai (ytbot_<pid>_xxxx), taaki sweeper zinda sibling workers ki dir na hataye
+    DOWNLOAD_PATH = tempfile.mkdtemp(prefix=f"{DOWNLOAD_PREFIX}{os.getpid()}_", dir=DOWNLOAD_BASE)
+    STALE_DOWNLOAD_AGE = 60 * 60  # seconds
+    # yt-dlp ka player JS / signature cache; ytbot_* nahi hai, isliye sweeper ise nahi hatata
+    YTDLP_CACHE_DIR = os.environ.get("YTDLP_CACHE_DIR", os.path.join(tempfile.gettempdir(), 'ytdlp-cache'))
+    SPOOL_MAX_SIZE = int(os.environ.get("SPOOL_MAX_SIZE", 10 << 20))  # Isse chhoti files RAM mein hi rehti hain
+    CHUNK_SIZE = 256 * 1024
+    EXECUTOR_WORKERS = 8
+    MAX_CONCURRENT_DOWNLOADS = 4
+    META_CACHE_SIZE = 1024
+    META_CACHE_TTL = 600  # seconds
+    TITLE_CACHE_TTL = 6 * 60 * 60  # seconds; title format URLs ki tarah expire nahi hota
+    FILE_ID_CACHE_SIZE = 1024
+    FILE_ID_CACHE_TTL = 30 * 60  # seconds
+    MAX_QUALITY_OPTIONS = 4
+    HTTP_POOL_LIMIT = 32
+    # Quality chunne mein user ko time lagta hai; probe wala googlevideo connection download tak zinda rahe
+    HTTP_KEEPALIVE_TIMEOUT = 75  # seconds
+    SIZE_PROBE_TIMEOUT = 5  # seconds
+    BOT_API_POOL_SIZE = 64
+    BOT_API_POOL_TIMEOUT = 30  # seconds; busy pool mein request fail hone ke bajaye intezaar kare
+    UPLOAD_TIMEOUT_MIN = 30  # seconds
+    UPLOAD_SECONDS_PER_MB = 2
+    FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+    # Optional: set ho to titles aur file_id processes/restarts ke beech share hote hain.
+    # Format URLs kabhi share nahi hote: woh signed hain, ~6h mein expire hote hain aur extract karne wale IP se bandhe hain.
+    REDIS_URL = os.environ.get("REDIS_URL")
+    REDIS_TITLE_TTL = 6 * 60 * 60  # seconds
+    REDIS_FILE_ID_TTL = 30 * 24 * 60 * 60  # seconds
+
+# ========================================================================================
+# === 4. CORE BOT STATE & LIFECYCLE HOOKS ================================================
+# ========================================================================================
+# Poore process ke liye ek hi aiohttp session, taaki TCP/TLS connections reuse hon
+SESSION: aiohttp.ClientSession | None = None
+# Shared cache (sirf jab REDIS_URL set ho); in-process TTLCaches iske aage L1 ki tarah kaam karte hain
+REDIS: aioredis.Redis | None = None
+# YoutubeDL thread-safe nahi hai, isliye har executor thread ka apna instance. Signature cache
+# disk par (cachedir) hai, to saare instances use share karte hain.
+_YDL_LOCAL = threading.local()
+_YDL_INSTANCES: list[yt_dlp.YoutubeDL] = []
+_YDL_INSTANCES_LOCK = threading.Lock()
+
+def get_ydl() -> yt_dlp.YoutubeDL:
+    ydl = getattr(_YDL_LOCAL, 'ydl', None)
+    if ydl is None:
+        ydl = _YDL_LOCAL.ydl = yt_dlp.YoutubeDL({'quiet': True, 'skip_download': True, 'cachedir': Config.YTDLP_CACHE_DIR})
+        with _YDL_INSTANCES_LOCK:
+            _YDL_INSTANCES.append(ydl)
+    return ydl
+
+def _warm_up_ytdlp():
+    # Thread ka YoutubeDL aur YouTube extractor pehle update se pehle hi load ho jaye
+    get_ydl().get_info_extractor('Youtube')
+
+# Blocking yt-dlp calls is shared pool mein chalte hain, event loop par nahi.
+# Har naya worker thread initializer mein apna YoutubeDL warm kar leta hai.
+EXECUTOR = ThreadPoolExecutor(
+    max_workers=Config.EXECUTOR_WORKERS, thread_name_prefix="ytdlp", initializer=_warm_up_ytdlp
+)
+# Ek saath kitne downloads chalein, taaki bandwidth saturate na ho
+DL_SEM = asyncio.Semaphore(Config.MAX_CONCURRENT_DOWNLOADS)
+# Kitne downloads slot ka intezaar kar rahe hain (user ko queue position dikhane ke liye)
+QUEUE_DEPTH = 0
+# video_id -> slim info (title + formats ke direct URL/filesize), taaki button click par dobara fetch na ho
+META_CACHE = TTLCache(maxsize=Config.META_CACHE_SIZE, ttl=Config.META_CACHE_TTL)
+# video_id -> title; META_CACHE expire hone ke baad bhi caption ke liye page dobara fetch na karna pade
+TITLE_CACHE = TTLCache(maxsize=Config.META_CACHE_SIZE, ttl=Config.TITLE_CACHE_TTL)
+# (video_id, itag) -> Telegram file_id; haal hi mein bheji video dobara download nahi hoti
+FILE_ID_CACHE = TTLCache(maxsize=Config.FILE_ID_CACHE_SIZE, ttl=Config.FILE_ID_CACHE_TTL)
+# (video_id, itag) -> Future[file_id]; ek hi video ke parallel clicks ek hi download share karte hain
+INFLIGHT: dict[tuple[str, int], asyncio.Future] = {}
+# video_id -> chal raha metadata fetch; khatam hote hi entry hat jati hai, isliye dict bounded rehta hai
+META_INFLIGHT: dict[str, asyncio.Task] = {}
+# (chat_id, message_id) jin keyboards ka download chal raha hai; dobara tap par sirf toast, dobara send nahi
+ACTIVE_MESSAGES: set[tuple[int, int]] = set()
+# Fire-and-forget cleanup tasks ke references, taaki GC inhe beech mein na hata de
+BACKGROUND_TASKS: set[asyncio.Future] = set()
+
+def _owner_is_alive(name: str) -> bool:
+    """ytbot_<pid>_xxxx ka process abhi chal raha hai? PID na mile to False (sirf mtime decide karega)"""
+    pid = name[len(Config.DOWNLOAD_PREFIX):].split('_', 1)[0]
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def sweep_stale_downloads():
+    """Pichle crashed processes ki bachi hui ytbot_* directories hata deta hai (zinda processes ki nahi)"""
+    cutoff = time.time() - Config.STALE_DOWNLOAD_AGE
+    with os.scandir(Config.DOWNLOAD_BASE) as entries:
+        for entry in entries:
+            if not entry.name.startswith(Config.DOWNLOAD_PREFIX) or entry.path == Config.DOWNLOAD_PATH:
+                continue
+            if _owner_is_alive(entry.name):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    else:
+                        os.unlink(entry.path)
+                    logger.info("Stale download hataya: %s", entry.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Stale download cleanup error (%s): %s", entry.path, e)
+
+async def post_init(application: Application):
+    """Har worker mein ek baar, pehle update se pehle chalta hai.
+    Bot.get_me() application.initialize() mein ho chuka hota hai, to Telegram connection bhi khul chuka hai."""
+    global SESSION, REDIS
+    SESSION = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+        limit=Config.HTTP_POOL_LIMIT, ttl_dns_cache=300, keepalive_timeout=Config.HTTP_KEEPALIVE_TIMEOUT
+    ))
+    logger.info("Shared aiohttp session ready.")
+    if Config.REDIS_URL:
+        REDIS = aioredis.from_url(Config.REDIS_URL)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        loop.run_in_executor(EXECUTOR, _warm_up_ytdlp),
+        loop.run_in_executor(EXECUTOR, sweep_stale_downloads),
+    )
+
+async def post_shutdown(application: Application):
+    if SESSION and not SESSION.closed:
+        await SESSION.close()
+    if REDIS:
+        await REDIS.aclose()
+    EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    with _YDL_INSTANCES_LOCK:
+        for ydl in _YDL_INSTANCES:
+            ydl.close()
+        _YDL_INSTANCES.clear()
+    shutil.rmtree(Config.DOWNLOAD_PATH, ignore_errors=True)
+
+# ========================================================================================
+# === 5. TELEGRAM HELPER & HANDLERS ======================================================
+# ========================================================================================
+# Link se seedha 11-character video_id nikalta hai; non-links yahin reject ho jate hain.
+# Host ke aage/ID ke peeche boundary hai, taaki "notyoutube.com" ya lambe IDs match na hon.
+_YT_RE = re.compile(
+    r'(?<![\w.-])(?:https?://)?(?:www\.|m\.|music\.)?'
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:[^#\s]*&)?v=|shorts/|embed/|live/)|youtu\.be/)'
+    r'([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])',
+    re.IGNORECASE,
+)
+
+_INV_MB = 1.0 / (1024 * 1024)
+# callback_data ka action code; chhota rakhne se Telegram ki 64-byte limit mein jagah bachti hai
+_DOWNLOAD_ACTION = "d"
+_B36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def to_base36(n: int) -> str:
+    """itag ko base36 mein likhta hai (callback_data chhota rehta hai); wapas int(s, 36) se"""
+    digits = ""
+    while True:
+        n, rem = divmod(n, 36)
+        digits = _B36_DIGITS[rem] + digits
+        if not n:
+            return digits
+
+_FORMAT_KEYS = (
+    'format_id', 'ext', 'protocol', 'vcodec', 'acodec', 'height', 'tbr',
+    'filesize', 'filesize_approx', 'url', 'http_headers',
+)
+# Sirf direct file downloads; HLS/DASH manifests (m3u8 ki size sirf playlist ki hoti hai) nahi
+_DIRECT_PROTOCOLS = ('https', 'http')
+
+def _slim_format(f: dict) -> dict:
+    fmt = {k: f.get(k) for k in _FORMAT_KEYS}
+    # process=False par 'protocol' sirf manifest formats mein hota hai; direct formats ka URL se nikalna padta hai
+    if not fmt['protocol'] and fmt['url']:
+        fmt['protocol'] = yt_dlp.utils.determine_protocol(f)
+    return fmt
+
+def _extract_info(url: str) -> dict:
+    """yt-dlp se sirf metadata nikalta hai (blocking, thread mein chalayein)"""
+    info = get_ydl().extract_info(url, download=False, process=False)
+    # Cache mein sirf kaam ki cheezein rakhein, poora info dict kaafi bada hota hai.
+    # Formats format_id se indexed hain, taaki button click par seedha lookup ho (scan nahi)
+    formats = {str(f.get('format_id')): _slim_format(f) for f in info.get('formats') or []}
+    audio = best_audio_format(formats.values())
+    return {
+        'id': info['id'],
+        'title': info.get('title'),
+        'formats': formats,
+        'audio_format_id': audio['format_id'] if audio else None,
+    }
+
+async def redis_get(key: str):
+    """Redis se value; Redis na ho ya error aaye to None (bot Redis ke bina bhi chalta rahe)"""
+    if REDIS is None:
+        return None
+    try:
+        return await REDIS.get(key)
+    except aioredis.RedisError as e:
+        logger.warning("Redis GET error (%s): %s", key, e)
+        return None
+
+async def redis_set(key: str, value, ttl: int):
+    if REDIS is None:
+        return
+    try:
+        await REDIS.set(key, value, ex=ttl)
+    except aioredis.RedisError as e:
+        logger.warning("Redis SET error (%s): %s", key, e)
+
+async def fetch_video_info(url: str) -> dict:
+    loop = asyncio.get_running_loop()
+    info = await loop.run_in_executor(EXECUTOR, _extract_info, url)
+    META_CACHE[info['id']] = info
+    TITLE_CACHE[info['id']] = info['title']
+    if info['title'] is not None:
+        await redis_set(f"video:title:{info['id']}", info['title'], Config.REDIS_TITLE_TTL)
+    return info
+
+async def get_video_info(video_id: str) -> dict:
+    info = META_CACHE.get(video_id)
+    if info is not None:
+        return info
+    # Same video ke parallel requests ek hi fetch share karte hain
+    task = META_INFLIGHT.get(video_id)
+    if task is None:
+        task = META_INFLIGHT[video_id] = asyncio.ensure_future(
+            fetch_video_info(f"https://www.youtube.com/watch?v={video_id}")
+        )
+        task.add_done_callback(lambda _: META_INFLIGHT.pop(video_id, None))
+    return await asyncio.shield(task)
+
+async def get_file_id(video_id: str, itag: int):
+    """Pehle bheji gayi video ka Telegram file_id (process cache, phir Redis)"""
+    file_id = FILE_ID_CACHE.get((video_id, itag))
+    if file_id is None:
+        cached = await redis_get(f"media:{video_id}:{itag}")
+        if cached:
+            file_id = FILE_ID_CACHE[(video_id, itag)] = cached.decode()
+    return file_id
+
+async def store_file_id(video_id: str, itag: int, file_id: str):
+    FILE_ID_CACHE[(video_id, itag)] = file_id
+    await redis_set(f"media:{video_id}:{itag}", file_id, Config.REDIS_FILE_ID_TTL)
+
+async def get_video_title(video_id: str):
+    """Caption ke liye title (process cache, phir Redis); sirf dono miss hon to YouTube se fetch hota hai"""
+    title = TITLE_CACHE.get(video_id)
+    if title is None:
+        cached = await redis_get(f"video:title:{video_id}")
+        if cached:
+            title = TITLE_CACHE[video_id] = cached.decode()
+        else:
+            title = (await get_video_info(video_id))['title']
+    return title
+
+def close_in_background(file_obj):
+    """Buffer ko executor mein band karta hai; spilled file ka close/unlink upload ke critical path par nahi aata"""
+    task = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(EXECUTOR, file_obj.close))
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+
+def _filesize(fmt: dict):
+    return fmt.get('filesize') or fmt.get('filesize_approx')
+
+def best_audio_format(formats):
+    """Sabse achha m4a audio-only format (adaptive video ke saath mux karne ke liye)"""
+    audios = [
+        f for f in formats
+        if f.get('protocol') in _DIRECT_PROTOCOLS and f.get('ext') == 'm4a'
+        and f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')
+    ]
+    return max(audios, key=lambda f: f.get('tbr') or 0, default=None)
+
+def get_format(info: dict, format_id):
+    return info['formats'].get(str(format_id))
+
+def get_audio_format(info: dict):
+    return get_format(info, info['audio_format_id']) if info.get('audio_format_id') else None
+
+def _is_video_candidate(fmt: dict) -> bool:
+    return fmt.get('protocol') in _DIRECT_PROTOCOLS and fmt.get('ext') == 'mp4' and fmt.get('vcodec') not in (None, 'none') and str(fmt.get('format_id', '')).isdigit()
+
+async def _probe_filesize(fmt: dict):
+    try:
+        async with SESSION.head(
+            fmt['url'], headers=fmt.get('http_headers'), allow_redirects=True,
+            timeout=aiohttp.ClientTimeout(total=Config.SIZE_PROBE_TIMEOUT),
+        ) as response:
+            if response.status == 200 and response.content_length:
+                fmt['filesize'] = response.content_length
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning("Filesize probe fail (%s): %s", fmt.get('format_id'), e)
+
+async def fill_missing_filesizes(info: dict):
+    """Jin formats ka size metadata mein nahi hai, unke HEAD probes ek saath (1 RTT, N nahi)"""
+    audio = get_audio_format(info)
+    candidates = [f for f in info['formats'].values() if _is_video_candidate(f)]
+    if audio:
+        candidates.append(audio)
+    missing = [f for f in candidates if not _filesize(f) and f.get('url')]
+    if not missing:
+        return
+    await asyncio.gather(*(_probe_filesize(f) for f in missing))
+
+def build_quality_options(info: dict) -> list:
+    """Har resolution ke liye sabse achha option jo MAX_FILE_SIZE mein fit ho (top MAX_QUALITY_OPTIONS tak).
+    Progressive mp4 seedha bhejte hain; adaptive (video-only) mp4 best audio ke saath mux hota hai."""
+    audio = get_audio_format(info)
+    audio_size = _filesize(audio) if audio else None
+    best_per_height = {}
+    for fmt in info['formats'].values():
+        if not _is_video_candidate(fmt):
+            continue
+        filesize = _filesize(fmt)
+        if not filesize:
+            continue
+        if fmt.get('acodec') in (None, 'none'):
+            if not audio_size:
+                continue
+            filesize += audio_size
+        if filesize > Config.MAX_FILE_SIZE:
+            continue
+        height = fmt.get('height') or 0
+        if height not in best_per_height or filesize > best_per_height[height]['filesize']:
+            best_per_height[height] = {'format_id': fmt['format_id'], 'height': height, 'filesize': filesize}
+    heights = islice(sorted(best_per_height, reverse=True), Config.MAX_QUALITY_OPTIONS)
+    return [best_per_height[h] for h in heights]
+
+async def _stream_to_buffer(fmt: dict, buffer):
+    async with SESSION.get(fmt['url'], headers=fmt.get('http_headers')) as response:
+        response.raise_for_status()
+        async for chunk in response.content.iter_chunked(Config.CHUNK_SIZE):
+            buffer.write(chunk)
+            if buffer.tell() > Config.MAX_FILE_SIZE:
+                raise ValueError("File size limit se badi hai")
+
+async def _feed_pipe(fmt: dict, pipe):
+    """HTTP download ko ffmpeg ke input pipe mein likhta hai (non-blocking, flow control ke saath)"""
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, pipe)
+    writer = asyncio.StreamWriter(transport, protocol, None, loop)
+    try:
+        async with SESSION.get(fmt['url'], headers=fmt.get('http_headers')) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(Config.CHUNK_SIZE):
+                writer.write(chunk)
+                await writer.drain()
+    finally:
+        writer.close()
+
+async def _drain_stdout(stdout, buffer):
+    while chunk := await stdout.read(Config.CHUNK_SIZE):
+        buffer.write(chunk)
+        if buffer.tell() > Config.MAX_FILE_SIZE:
+            raise ValueError("File size limit se badi hai")
+
+async def _mux_to_buffer(video_fmt: dict, audio_fmt: dict, buffer):
+    """Video-only aur audio-only streams ko ffmpeg se on-the-fly fragmented mp4 mein mux karta hai"""
+    video_read, video_write = os.pipe()
+    audio_read, audio_write = os.pipe()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            Config.FFMPEG_BIN, '-loglevel', 'error',
+            '-i', f'pipe:{video_read}', '-i', f'pipe:{audio_read}',
+            '-map', '0:v', '-map', '1:a', '-c', 'copy',
+            '-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov', 'pipe:1',
+            pass_fds=(video_read, audio_read),
+            stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+        )
+    except Exception:
+        os.close(video_write)
+        os.close(audio_write)
+        raise
+    finally:
+        os.close(video_read)
+        os.close(audio_read)
+    # File objects turant bana lete hain, taaki task shuru hone se pehle cancel ho to bhi fd band ho jaye
+    video_pipe = os.fdopen(video_write, 'wb', buffering=0)
+    audio_pipe = os.fdopen(audio_write, 'wb', buffering=0)
+    tasks = [
+        asyncio.create_task(_feed_pipe(video_fmt, video_pipe)),
+        asyncio.create_task(_feed_pipe(audio_fmt, audio_pipe)),
+        asyncio.create_task(_drain_stdout(proc.stdout, buffer)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+        if await proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exit code {proc.returncode}")
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        video_pipe.close()
+        audio_pipe.close()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+def new_download_buffer(expected_size):
+    """Download ke liye sahi buffer: chhoti files RAM mein, badi seedha disk par (rollover copy ke bina)"""
+    # Koi aur process (jaise dusre container ka sweeper) dir hata de to bhi downloads fail na hon
+    os.makedirs(Config.DOWNLOAD_PATH, exist_ok=True)
+    if Config.TELEGRAM_LOCAL_API:
+        # Local server ko path dena hai, isliye file disk par naam ke saath chahiye
+        return tempfile.NamedTemporaryFile(dir=Config.DOWNLOAD_PATH, suffix='.mp4')
+    if expected_size and expected_size > Config.SPOOL_MAX_SIZE:
+        return tempfile.TemporaryFile(dir=Config.DOWNLOAD_PATH)
+    return tempfile.SpooledTemporaryFile(max_size=Config.SPOOL_MAX_SIZE, dir=Config.DOWNLOAD_PATH)
+
+async def download_video_from_yt(video_id: str, itag: int):
+    """Format ke direct URL se bytes seedha download buffer mein stream karta hai (disk round-trip nahi)"""
+    buffer = None
+    try:
+        info = await get_video_info(video_id)
+        fmt = get_format(info, itag)
+        if not fmt:
+            raise ValueError(f"Format {itag} nahi mila")
+        logger.info("Downloading '%s'", info.get('title'))
+        if fmt.get('acodec') in (None, 'none'):
+            audio_fmt = get_audio_format(info)
+            if not audio_fmt:
+                raise ValueError("Mux ke liye audio format nahi mila")
+            buffer = new_download_buffer((_filesize(fmt) or 0) + (_filesize(audio_fmt) or 0))
+            await _mux_to_buffer(fmt, audio_fmt, buffer)
+        else:
+            buffer = new_download_buffer(_filesize(fmt))
+            await _stream_to_buffer(fmt, buffer)
+        buffer.seek(0)
+        return buffer, info.get('title')
+    except Exception:
+        logger.exception("Download helper error (%s/%s)", video_id, itag)
+        if buffer:
+            close_in_background(buffer)
+        return None, None
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    await update.message.reply_html(f"Salaam, {user.mention_html()}! Muje YouTube link bhejein.")
+
+async def link_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    match = _YT_RE.search(update.message.text)
+    if not match:
+        return await update.message.reply_text("Kripya ek aam YouTube video ka link bhejein.")
+    sent_message = await update.message.reply_text("⏳ Processing...")
+    try:
+        info = await get_video_info(match.group(1))
+        await fill_missing_filesizes(info)
+        video_id = info['id']
+        keyboard = [
+            [InlineKeyboardButton(
+                f"{option['height']}p ({option['filesize'] * _INV_MB:.1f} MB)",
+                callback_data="|".join((_DOWNLOAD_ACTION, video_id, to_base36(int(option['format_id'])))),
+            )]
+            for option in build_quality_options(info)
+        ]
+        if not keyboard:
+            return await sent_message.edit_text(
+                f"😕 {Config.MAX_FILE_SIZE // (1024 * 1024)} MB se kam ka koi option nahi mila."
+            )
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await sent_message.edit_text(
+            f"<b>Video:</b> {info.get('title')}\n\nSelect a quality:",
+            reply_markup=reply_markup, parse_mode=ParseMode.HTML
+        )
+    except Exception:
+        logger.exception("Link handler error for %s", update.message.text)
+        await sent_message.edit_text("❌ Error: Video private ya unavailable ho sakti hai.")
+
+async def acquire_download_slot(query):
+    """DL_SEM ka slot leta hai; saare slots busy hon to user ko queue position dikhata hai.
+    Bina queue ke koi message edit nahi hota ("Downloading" callback answer mein hi dikh chuka hai)."""
+    global QUEUE_DEPTH
+    if not DL_SEM.locked():
+        return await DL_SEM.acquire()
+    QUEUE_DEPTH += 1
+    try:
+        await query.edit_message_text(text=f"⏳ Queue mein hai (position {QUEUE_DEPTH})...")
+        await DL_SEM.acquire()
+    finally:
+        QUEUE_DEPTH -= 1
+    try:
+        await query.edit_message_text(text="⬇️ Downloading...")
+    except BaseException:
+        DL_SEM.release()
+        raise
+
+def upload_timeout(size_bytes: int) -> float:
+    """Upload timeout file size ke hisaab se: chhoti files jaldi fail hon, badi files beech mein na kategi"""
+    return max(Config.UPLOAD_TIMEOUT_MIN, size_bytes * _INV_MB * Config.UPLOAD_SECONDS_PER_MB)
+
+async def send_by_url(query, bot: Bot, video_id: str, itag: int):
+    """Chhote progressive mp4 ko Telegram seedha format URL se fetch kare (bytes bot host se nahi guzarte).
+    Band ho, URL IP-locked ho ya Telegram use na khol paye to None, taaki normal download par fallback ho."""
+    if not Config.URL_UPLOAD:
+        return None
+    info = await get_video_info(video_id)
+    fmt = get_format(info, itag)
+    if not fmt or not fmt.get('url') or fmt.get('acodec') in (None, 'none'):
+        return None
+    if 'ip' in parse_qs(urlsplit(fmt['url']).query):
+        # Telegram ke servers se yeh URL 403 dega; bekaar sendVideo round-trip bachao
+        return None
+    filesize = _filesize(fmt)
+    if not filesize or filesize > Config.URL_UPLOAD_MAX_SIZE:
+        return None
+    # Telegram pehle poori file URL se fetch karta hai, phir jawab deta hai; default 30s read timeout kam hai
+    timeout = upload_timeout(filesize)
+    try:
+        return await bot.send_video(
+            chat_id=query.message.chat_id, video=fmt['url'],
+            caption=f"✅ Done: {info.get('title')}", supports_streaming=True,
+            read_timeout=timeout, write_timeout=timeout
+        )
+    except NetworkError as e:
+        # BadRequest aur TimedOut dono yahin; URL wala try sirf speculative hai, to har fail par download karein
+        logger.info("URL se send nahi hua, download par fallback (%s/%s): %s", video_id, itag, e)
+        return None
+
+async def download_and_upload(query, bot: Bot, video_id: str, itag: int):
+    """Video download karke upload karta hai aur Telegram ka file_id lautata hai (fail hone par None)"""
+    message = await send_by_url(query, bot, video_id, itag)
+    if message:
+        return message.video.file_id if message.video else None
+    video_file = None
+    try:
+        await acquire_download_slot(query)
+        try:
+            video_file, video_title = await download_video_from_yt(video_id, itag)
+        finally:
+            DL_SEM.release()
+        if not video_file:
+            return None
+        if Config.TELEGRAM_LOCAL_API:
+            # Local mode: sirf file ka path jata hai, local server disk se padhta hai
+            video_file.flush()
+            timeout = upload_timeout(video_file.seek(0, os.SEEK_END))
+            video = Path(video_file.name)
+        else:
+            # PTB file object ko poora synchronously read karta hai; spilled file ka read event loop na roke,
+            # isliye bytes executor mein padh kar dete hain
+            video = await asyncio.get_running_loop().run_in_executor(EXECUTOR, video_file.read)
+            timeout = upload_timeout(len(video))
+        message = await bot.send_video(
+            chat_id=query.message.chat_id, video=video, filename=f"{video_id}.mp4",
+            caption=f"✅ Done: {video_title}", supports_streaming=True,
+            read_timeout=timeout, write_timeout=timeout
+        )
+        return message.video.file_id if message.video else None
+    finally:
+        if video_file:
+            close_in_background(video_file)
+
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        action, video_id, itag_str = query.data.split('|')
+        itag = int(itag_str, 36)
+    except (AttributeError, ValueError):
+        action = None
+    if action != _DOWNLOAD_ACTION or query.message is None:
+        # Purane format (download|id|137), anjaan data ya gayab message; spinner atakne se pehle hi jawab
+        return await query.answer("♻️ Yeh button purana hai, link dobara bhejein.")
+    try:
+        chat_id = query.message.chat_id
+        message_key = (chat_id, query.message.message_id)
+        if message_key in ACTIVE_MESSAGES:
+            # Keyboard abhi bhi dikh raha hai; doosra tap padne par video dobara nahi bhejni
+            return await query.answer("⏳ Yeh video pehle se download ho rahi hai...")
+        # Status callback ke ack ke saath hi dikh jata hai; alag edit_message_text round-trip nahi
+        await query.answer("⬇️ Downloading...")
+        ACTIVE_MESSAGES.add(message_key)
+        try:
+            await deliver_video(query, context, video_id, itag)
+        finally:
+            ACTIVE_MESSAGES.discard(message_key)
+    except Exception:
+        logger.exception("Button callback error for %s", query.data)
+
+async def deliver_video(query, context: ContextTypes.DEFAULT_TYPE, video_id: str, itag: int):
+    """Video bhejta hai; upload path par koi bhi error aaye to user ko keyboard message par hi batata hai"""
+    try:
+        await _deliver_video(query, context, video_id, itag)
+    except Exception:
+        logger.exception("Video deliver nahi hui (%s/%s)", video_id, itag)
+        try:
+            await query.edit_message_text("❌ Download fail ho gaya.")
+        except NetworkError as e:
+            logger.warning("Fail message edit nahi hua (%s/%s): %s", video_id, itag, e)
+
+async def _deliver_video(query, context: ContextTypes.DEFAULT_TYPE, video_id: str, itag: int):
+    """Cached file_id, chal rahe download ka result, ya naya download+upload; success par keyboard message hatata hai"""
+    key = (video_id, itag)
+    chat_id = query.message.chat_id
+    file_id = await get_file_id(video_id, itag)
+    if file_id is None and key in INFLIGHT:
+        # Koi aur yahi video abhi download kar raha hai, uske result ka intezaar karein
+        file_id = await asyncio.shield(INFLIGHT[key])
+        if not file_id:
+            return await query.edit_message_text("❌ Download fail ho gaya.")
+    if file_id:
+        video_title = await get_video_title(video_id)
+        await context.bot.send_video(
+            chat_id=chat_id, video=file_id,
+            caption=f"✅ Done: {video_title}", supports_streaming=True
+        )
+        return await query.delete_message()
+
+    future = asyncio.get_running_loop().create_future()
+    INFLIGHT[key] = future
+    try:
+        file_id = await download_and_upload(query, context.bot, video_id, itag)
+    finally:
+        INFLIGHT.pop(key, None)
+        future.set_result(file_id)
+    if file_id is None:
+        return await query.edit_message_text("❌ Download fail ho gaya.")
+    await store_file_id(video_id, itag, file_id)
+    await query.delete_message()
+
+# ========================================================================================
+# === 6. APPLICATION SETUP ===============================================================
+# ========================================================================================
+def register_handlers(application: Application):
+    """Saare bot handlers Application mein add karta hai (har entrypoint isi ko use kare)"""
+    # block=False: lambi yt-dlp/download calls baaki users ke updates ko nahi rokti
+    application.add_handler(CommandHandler(["start", "help"], start_command, block=False))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, link_handler, block=False))
+    application.add_handler(CallbackQueryHandler(button_handler, block=False))
+
+def build_application() -> Application:
+    # HTTP/1.1 jaan-boojh kar: HTTP/2 sab requests ko ek hi TCP connection par multiplex karta hai, tab bade
+    # sendVideo uploads usi connection ki bandwidth ke liye ladte hain aur pool size ka koi asar nahi rehta.
+    # HTTP/1.1 mein har upload apne connection par chalta hai; pool itna bada ki concurrent uploads queue na hon
+    request = HTTPXRequest(
+        http_version="1.1", connection_pool_size=Config.BOT_API_POOL_SIZE,
+        read_timeout=Config.UPLOAD_TIMEOUT_MIN, write_timeout=Config.UPLOAD_TIMEOUT_MIN,
+        pool_timeout=Config.BOT_API_POOL_TIMEOUT
+    )
+    # Webhook mode mein getUpdates kabhi nahi chalta, uske liye ek connection kaafi hai
+    get_updates_request = HTTPXRequest(connection_pool_size=1)
+    bot = Bot(
+        token=Config.TELEGRAM_TOKEN, request=request, get_updates_request=get_updates_request,
+        base_url=f"{Config.TELEGRAM_API_BASE}/bot", base_file_url=f"{Config.TELEGRAM_API_BASE}/file/bot",
+        local_mode=bool(Config.TELEGRAM_LOCAL_API),
+    )
+    application = (
+        Application.builder().bot(bot).concurrent_updates(True)
+        .post_init(post_init).post_shutdown(post_shutdown).build()
+    )
+    register_handlers(application)
+    return application
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# bot_core import par hi Config env vars padhta hai; tests ke liye dummy values kaafi hain
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("WEBHOOK_URL", "https://example.invalid")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+import bot_core
+
+# process=False wale raw YouTube formats: direct https formats mein 'protocol' key hoti hi nahi
+RAW_INFO = {
+    'id': 'dQw4w9WgXcQ',
+    'title': 'Test video',
+    'formats': [
+        {'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2', 'height': 360,
+         'filesize': 8 << 20, 'url': 'https://rr1---sn-x.googlevideo.com/videoplayback?itag=18'},
+        {'format_id': '137', 'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'none', 'height': 1080,
+         'filesize': 30 << 20, 'url': 'https://rr1---sn-x.googlevideo.com/videoplayback?itag=137'},
+        {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'tbr': 129,
+         'filesize': 3 << 20, 'url': 'https://rr1---sn-x.googlevideo.com/videoplayback?itag=140'},
+        {'format_id': '96', 'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'mp4a.40.2', 'height': 1080,
+         'protocol': 'm3u8_native', 'filesize_approx': 1 << 10,
+         'url': 'https://manifest.googlevideo.com/api/manifest/hls_playlist/itag/96/index.m3u8'},
+    ],
+}
+
+
+class FakeYDL:
+    def extract_info(self, url, download=False, process=True):
+        assert process is False
+        return RAW_INFO
+
+
+def test_protocol_less_direct_formats_are_offered(monkeypatch):
+    monkeypatch.setattr(bot_core, 'get_ydl', FakeYDL)
+    info = bot_core._extract_info('https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+
+    assert info['formats']['18']['protocol'] == 'https'
+    assert info['audio_format_id'] == '140'
+    options = bot_core.build_quality_options(info)
+    assert [o['format_id'] for o in options] == ['137', '18']
+    assert options[0]['filesize'] == (30 << 20) + (3 << 20)
+
+
+def test_hls_formats_are_not_offered(monkeypatch):
+    monkeypatch.setattr(bot_core, 'get_ydl', FakeYDL)
+    info = bot_core._extract_info('https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+
+    assert not bot_core._is_video_candidate(info['formats']['96'])